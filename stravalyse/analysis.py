@@ -12,6 +12,9 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
+# Format used to display float values in the printed statistics
+STATISTICS_FLOAT_FORMAT = '{:,.2f}'.format
+
 
 def _generate_moving_time_heatmap(*args, **kwargs):
     """
@@ -281,7 +284,7 @@ def _generate_summary_statistics(x: pd.Series) -> pd.Series:
     return series
 
 
-def display_start_country_plot(activity_df: pd.DataFrame, colour_palette: list):
+def display_start_country_plot(activity_df: pd.DataFrame, colour_palette: list, show: bool = True):
     """
     Generate and display a bar plot of the number of activities started in each
     country (by type).
@@ -289,6 +292,8 @@ def display_start_country_plot(activity_df: pd.DataFrame, colour_palette: list):
     Arguments:
     activity_df - A pandas DataFrame containing the activity data.
     colour_palette - The colour palette to generate the heatmap with.
+    show - Display the plot immediately. If False, the plot is displayed by the next call to
+           show_plots().
     """
 
     # TODO: Exclude virtual activities
@@ -306,17 +311,21 @@ def display_start_country_plot(activity_df: pd.DataFrame, colour_palette: list):
 
     # Generate and display the plot
     _generate_start_country_plot(activity_data, ax, colour_palette)
-    plt.show()
+
+    if show:
+        plt.show()
 
 
 def display_moving_time_heatmap(activity_df: pd.DataFrame, colour_palette: list,
-                                heatmap_column_wrap: int):
+                                heatmap_column_wrap: int, show: bool = True):
     """
     Generate and display a heatmap of activity moving time over time (by type).
 
     Arguments:
     activity_df - A pandas DataFrame containing the activity data.
     colour_palette - The colour palette to generate the heatmap with.
+    show - Display the plot immediately. If False, the plot is displayed by the next call to
+           show_plots().
     """
 
     activity_data = activity_df[[
@@ -352,16 +361,20 @@ def display_moving_time_heatmap(activity_df: pd.DataFrame, colour_palette: list,
     fg = sns.FacetGrid(activity_data, col='type', col_wrap=heatmap_column_wrap)
     fg = fg.map_dataframe(_generate_moving_time_heatmap, 'year', 'month', 'moving_time',
                           annot=True, cbar=True, cmap=colour_palette)
-    plt.show()
 
+    if show:
+        plt.show()
 
-def display_mean_distance_plot(activity_df: pd.DataFrame, colour_palette: list):
+
+def display_mean_distance_plot(activity_df: pd.DataFrame, colour_palette: list, show: bool = True):
     """
     Generate and display a bar plot of mean activity distance over time (by type).
 
     Arguments:
     activity_df - A pandas DataFrame containing the activity data.
     colour_palette - The colour palette to generate the plot with.
+    show - Display the plot immediately. If False, the plot is displayed by the next call to
+           show_plots().
     """
 
     # Create a list of stationary activities to exclude from the plot
@@ -383,16 +396,20 @@ def display_mean_distance_plot(activity_df: pd.DataFrame, colour_palette: list):
 
     # Generate and display the plot
     _generate_mean_distance_plot(activity_data, ax, colour_palette)
-    plt.show()
 
+    if show:
+        plt.show()
 
-def display_activity_count_plot(activity_df: pd.DataFrame, colour_palette: list):
+
+def display_activity_count_plot(activity_df: pd.DataFrame, colour_palette: list, show: bool = True):
     """
     Generate and display a bar plot of activity counts over time (by type).
 
     Arguments:
     activity_df - A pandas DataFrame containing the activity data.
     colour_palette - The colour palette to generate the plot with.
+    show - Display the plot immediately. If False, the plot is displayed by the next call to
+           show_plots().
     """
 
     # Get only the activity types and start dates
@@ -406,10 +423,12 @@ def display_activity_count_plot(activity_df: pd.DataFrame, colour_palette: list)
 
     # Generate and display the plot
     _generate_activity_count_plot(activity_data, ax, colour_palette)
-    plt.show()
 
+    if show:
+        plt.show()
 
-def display_commute_plots(activity_df: pd.DataFrame, colour_palette: list):
+
+def display_commute_plots(activity_df: pd.DataFrame, colour_palette: list, show: bool = True):
     """
     Generate and display the following plots using data from activities
     marked as commutes:
@@ -421,6 +440,8 @@ def display_commute_plots(activity_df: pd.DataFrame, colour_palette: list):
     Arguments:
     activity_df - A pandas DataFrame containing the activity data.
     colour_palette - The colour palette to generate the plot with.
+    show - Display the plot immediately. If False, the plot is displayed by the next call to
+           show_plots().
     """
 
     # Get only commute data
@@ -435,7 +456,8 @@ def display_commute_plots(activity_df: pd.DataFrame, colour_palette: list):
     # Convert the activity distances from m to km
     commute_data.loc[:, 'distance'] = commute_data.loc[:, 'distance'] / 1000
 
-    # Create a new grid of subplots
+    # Create a new figure with a grid of subplots
+    plt.figure()
     ax1 = plt.subplot2grid((2, 2), (0, 0), rowspan=1, colspan=1)
     ax2 = plt.subplot2grid((2, 2), (0, 1), rowspan=1, colspan=1)
     ax3 = plt.subplot2grid((2, 2), (1, 0), rowspan=1, colspan=2)
@@ -447,6 +469,16 @@ def display_commute_plots(activity_df: pd.DataFrame, colour_palette: list):
     _generate_commute_days_plot(commute_data, ax1, colour_palette)
     _generate_commute_distance_plot(commute_data, ax2, colour_palette)
     _generate_commute_count_plot(commute_data, ax3, colour_palette)
+
+    if show:
+        plt.show()
+
+
+def show_plots():
+    """
+    Display all of the plots that have been generated but not yet displayed.
+    """
+
     plt.show()
 
 
@@ -466,7 +498,7 @@ def display_commute_statistics(activity_df: pd.DataFrame):
 
         print('Commute statistics:')
         print()
-        print(commute_statistics.T)
+        print(commute_statistics.T.to_string(float_format=STATISTICS_FLOAT_FORMAT))
         print()
     else:
         print('[Analysis]: No commutes found')
@@ -487,7 +519,7 @@ def display_summary_statistics(activity_df: pd.DataFrame):
         print()
         print('Summary statistics:')
         print()
-        print(summary_statistics.T)
+        print(summary_statistics.T.to_string(float_format=STATISTICS_FLOAT_FORMAT))
         print()
     else:
         print('[Analysis]: No activities found')
@@ -7,6 +7,8 @@ Felix van Oost 2024
 
 # Standard library
 import datetime
+import functools
+from pathlib import Path
 
 # Third-party
 from geopandas import GeoDataFrame
@@ -20,6 +22,9 @@ from shapely.geometry import Point, LineString
 geolocator = Nominatim(user_agent="Stravalyse")
 reverse_geocode = RateLimiter(geolocator.reverse, min_delay_seconds=1)
 
+# Number of decimal places the coordinates are rounded to before reverse geocoding (~11 m)
+ADDRESS_COORDINATE_PRECISION = 4
+
 
 def _decode_polyline(x: Series) -> list:
     """
@@ -32,11 +37,15 @@ def _decode_polyline(x: Series) -> list:
     A list of decoded coordinates from the polyline.
     """
 
+    # Use the full polyline if available, otherwise fall back to the summary polyline stored for
+    # activities without detailed data
+    polyline = x.get('polyline') or x.get('summary_polyline')
+
     # Check for both null and empty polyline strings
-    if not x['polyline'] or x['polyline'] is None:
+    if not polyline:
         map_coordinates = None
     else:
-        map_coordinates = decode(x['polyline'])
+        map_coordinates = decode(polyline)
 
     return map_coordinates
 
@@ -55,6 +64,23 @@ def _create_shapely_point(coordinates: Series) -> Point:
     return [Point(y, x) for x, y in coordinates]
 
 
+@functools.lru_cache(maxsize=None)
+def _get_address_cached(latitude: float, longitude: float) -> dict:
+    """
+    Get the address of a location from the given rounded coordinates, caching the result so
+    that locations shared by several activities are only reverse geocoded once.
+
+    Arguments:
+    latitude - The rounded latitude of the location.
+    longitude - The rounded longitude of the location.
+
+    Return:
+    The address of the location as a dictionary.
+    """
+
+    return reverse_geocode((latitude, longitude)).raw['address']
+
+
 def get_address(coordinates: list) -> dict:
     """
     Get the address of a location from the given coordinates using the Nominatim reverse geocoding
@@ -67,12 +93,14 @@ def get_address(coordinates: list) -> dict:
     address = None
 
     if coordinates:
-        address = reverse_geocode(coordinates).raw['address']
+        latitude, longitude = coordinates
+        address = dict(_get_address_cached(round(latitude, ADDRESS_COORDINATE_PRECISION),
+                                           round(longitude, ADDRESS_COORDINATE_PRECISION)))
 
     return address
 
 
-def export_geo_data_file(file_path: str, activity_dataframe: DataFrame):
+def export_geo_data_file(file_path: Path, activity_dataframe: DataFrame):
     """
     Export a GeoJSON-encoded file of geospatial data from all activities.
 
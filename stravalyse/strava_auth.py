@@ -6,8 +6,10 @@ Felix van Oost 2024
 """
 
 # Standard library
+import json
 import os
 import pathlib
+import re
 import time
 import webbrowser
 
@@ -16,10 +18,45 @@ from dotenv import load_dotenv
 from stravalib import Client
 from stravalib.protocol import AccessInfo
 
+# Keys used in the legacy tokens file and the corresponding AccessInfo fields
+TOKEN_FILE_KEYS = {'STRAVA_ACCESS_TOKEN': 'access_token',
+                   'STRAVA_REFRESH_TOKEN': 'refresh_token',
+                   'STRAVA_TOKEN_EXPIRY': 'expires_at'}
+
+# Pattern matching a 'KEY = value' line in the legacy tokens file
+LEGACY_TOKEN_PATTERN = re.compile(r'^(STRAVA_\w+)\s*=\s*(\S+)\s*$', re.MULTILINE)
+
+# Time before the access token expires at which it is refreshed, in seconds
+TOKEN_EXPIRY_MARGIN = 60
+
+
+def _read_legacy_tokens_from_file(file_path: pathlib.Path) -> AccessInfo:
+    """
+    Read the Strava authentication tokens and expiry time from a text file in the legacy
+    'KEY = value' format.
+
+    Arguments:
+    file_path - The path of the file to read the tokens from.
+
+    Return:
+    A dictionary containing the authentication tokens and expiry time.
+    """
+
+    tokens: AccessInfo = {}
+
+    for key, value in LEGACY_TOKEN_PATTERN.findall(file_path.read_text()):
+        field = TOKEN_FILE_KEYS.get(key)
+        if field:
+            tokens[field] = int(value) if field == 'expires_at' else value
+
+    return tokens
+
 
 def _read_tokens_from_file(file_path: pathlib.Path) -> AccessInfo:
     """
-    Read the Strava authentication tokens and expiry time from a text file.
+    Read the Strava authentication tokens and expiry time from a JSON file.
+
+    Tokens stored in the legacy text format are converted to JSON on first read.
 
     Arguments:
     file_path - The path of the file to read the tokens from.
@@ -35,15 +72,12 @@ def _read_tokens_from_file(file_path: pathlib.Path) -> AccessInfo:
 
     try:
         with file_path.open(mode='r') as file:
-            for line in file:
-                if line.startswith('STRAVA_ACCESS_TOKEN ='):
-                    tokens['access_token'] = line.split('=')[1].strip()
-                elif line.startswith('STRAVA_REFRESH_TOKEN ='):
-                    tokens['refresh_token'] = line.split('=')[1].strip()
-                elif line.startswith('STRAVA_TOKEN_EXPIRY ='):
-                    tokens['expires_at'] = line.split('=')[1].strip()
-                else:
-                    pass
+            tokens = json.load(file)
+    except json.JSONDecodeError:
+        # Convert tokens stored in the legacy text format to JSON
+        tokens = _read_legacy_tokens_from_file(file_path)
+        if tokens:
+            _write_tokens_to_file(file_path, tokens)
     except IOError:
         print('No authentication tokens found')
 
@@ -52,7 +86,7 @@ def _read_tokens_from_file(file_path: pathlib.Path) -> AccessInfo:
 
 def _write_tokens_to_file(file_path: pathlib.Path, tokens: AccessInfo):
     """
-    Write the Strava authentication tokens to a text file.
+    Write the Strava authentication tokens to a JSON file.
 
     Arguments:
     file_path - The path of the file to write the tokens to.
@@ -61,25 +95,27 @@ def _write_tokens_to_file(file_path: pathlib.Path, tokens: AccessInfo):
 
     print(f"Writing authentication tokens to '{file_path}'")
 
-    # Delete the file to remove any expired tokens
-    try:
-        file_path.unlink()
-    except OSError:
-        pass
-
-    # Write the tokens to a new file
-    with file_path.open(mode='w') as file:
-        file.write(f'STRAVA_ACCESS_TOKEN = {tokens['access_token']}\n')
-        file.write(f'STRAVA_REFRESH_TOKEN = {tokens['refresh_token']}\n')
-        file.write(f'STRAVA_TOKEN_EXPIRY = {tokens['expires_at']}\n')
+    # Write the tokens to a temporary file and move it over the existing file, so that the
+    # existing tokens are not lost if the write is interrupted
+    payload = json.dumps({'access_token': tokens['access_token'],
+                          'refresh_token': tokens['refresh_token'],
+                          'expires_at': tokens['expires_at']})
+    temp_file_path = file_path.with_name(f'{file_path.name}.tmp')
+    temp_file_path.write_text(payload)
+    temp_file_path.replace(file_path)
 
 
-def _get_initial_tokens(client: Client, client_id: int, client_secret: str) -> AccessInfo:
+def _get_initial_tokens(client: Client, client_id: int, client_secret: str,
+                        open_browser: bool = True) -> AccessInfo:
     """
         Get and return the initial Strava authentication tokens.
 
+        The authorization code is read from the STRAVA_AUTH_CODE environment variable if it is
+        set, otherwise the user is prompted for it.
+
         Arguments:
         client_info - A dictionary containing the client ID and secret.
+        open_browser - Open the authorization URL in a browser. If False, the URL is printed.
 
         Return:
         A dictionary containing the initial authentication tokens and expiry
@@ -88,14 +124,20 @@ def _get_initial_tokens(client: Client, client_id: int, client_secret: str) -> A
 
     print('Getting initial authentication tokens')
 
-    # Generate the authorization URL and open it in a browser
-    url = client.authorization_url(client_id=client_id,
-                                   redirect_uri='http://localhost', scope=['activity:read_all', 'profile:read_all'])
-    webbrowser.open(url)
+    auth_code = os.environ.get('STRAVA_AUTH_CODE')
+    if not auth_code:
+        # Generate the authorization URL and open it in a browser
+        url = client.authorization_url(client_id=client_id,
+                                       redirect_uri='http://localhost',
+                                       scope=['activity:read_all', 'profile:read_all'])
+        if open_browser:
+            webbrowser.open(url)
+        else:
+            print(f'Open the following URL in a browser to authorize access: {url}')
 
-    # TODO: Get the authorization code back from the response automatically. Currently, the code
-    # must be manually copied from the URL response in the browser window.
-    auth_code = str(input("Enter authorization code: "))
+        # TODO: Get the authorization code back from the response automatically. Currently, the
+        # code must be manually copied from the URL response in the browser window.
+        auth_code = str(input("Enter authorization code: "))
 
     # Exchange the authorization code for the initial set of tokens
     token_response: AccessInfo = client.exchange_code_for_token(client_id=client_id,
@@ -105,12 +147,13 @@ def _get_initial_tokens(client: Client, client_id: int, client_secret: str) -> A
     return token_response
 
 
-def authenticate(tokens_file_path: pathlib.Path) -> Client:
+def authenticate(tokens_file_path: pathlib.Path, open_browser: bool = True) -> Client:
     """
     Authenticate the given stravalib client with the Strava API.
 
     Arguments:
     tokens_file_path - The path of the file to store the Strava access tokens in.
+    open_browser - Open the authorization URL in a browser if initial tokens are required.
 
     Return:
     A stravalib Client.
@@ -125,8 +168,9 @@ def authenticate(tokens_file_path: pathlib.Path) -> Client:
     # Read the authentication tokens and expiry time from the file
     existing_tokens = _read_tokens_from_file(tokens_file_path)
     if existing_tokens:
-        # Refresh the tokens if they have expired and write the new tokens to the file
-        if time.time() >= int(existing_tokens['expires_at']):
+        # Refresh the tokens if they have expired (or are about to) and write the new tokens to
+        # the file
+        if time.time() >= existing_tokens['expires_at'] - TOKEN_EXPIRY_MARGIN:
             client = Client()
             new_tokens = client.refresh_access_token(client_id=client_id,
                                                      client_secret=client_secret,
@@ -137,7 +181,7 @@ def authenticate(tokens_file_path: pathlib.Path) -> Client:
     else:
         # Get the initial authentication tokens and write them to the file
         client = Client()
-        initial_tokens = _get_initial_tokens(client, client_id, client_secret)
+        initial_tokens = _get_initial_tokens(client, client_id, client_secret, open_browser)
         _write_tokens_to_file(tokens_file_path, initial_tokens)
 
     print('Access to the API authenticated')
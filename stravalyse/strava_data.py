@@ -6,18 +6,38 @@ Felix van Oost 2024
 """
 
 # Standard library
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from itertools import takewhile
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import os
+import pickle
+import re
 
 # Third-party
 import pandas as pd
 from stravalib import Client
 
-# Local
-import stravalyse.geo as geo
+# Columns containing ISO 8601 timestamps
+DATE_COLUMNS = ['start_date', 'start_date_local']
 
+# Margin added to the end of a date range when fetching activities from Strava, which filters
+# on UTC start times rather than the local start times used by the date range
+DATE_RANGE_FETCH_MARGIN = timedelta(days=1)
 
-def _parse_description_tag(activity_df: pd.DataFrame, tag_str: str, column_name: str, activity_types: list[str]) -> pd.DataFrame:
+# Start and end of a date range, where either may be None for no bound
+DateRange = tuple[datetime | None, datetime | None]
+
+# Suffix of the binary cache file stored alongside the activity data file
+CACHE_FILE_SUFFIX = '.pkl'
+
+# Maximum number of activities to fetch detailed data for concurrently
+MAX_FETCH_WORKERS = 4
+
+
+def _parse_description_tag(activity_df: pd.DataFrame, tag_str: str, column_name: str,
+                           activity_mask: pd.Series) -> pd.DataFrame:
     """
     Parse the string that follows the given tag (key) in activity descriptions and store it as a new
     column in the given DataFrame.
@@ -26,61 +46,153 @@ def _parse_description_tag(activity_df: pd.DataFrame, tag_str: str, column_name:
     activity_df - A pandas DataFrame containing the activity data.
     tag_str - The tag (key) to search for in the activity descriptions.
     column_name - The name of the column in the DataFrame that will contain the parsed data.
-    activity_types - The types of activities that contain the given tag.
+    activity_mask - A boolean mask of the activities whose types contain the given tag.
 
     Return:
     The activity_df with the new column added.
     """
 
-    # Get a Series of descriptions for the applicable activity types
-    activity_desc = activity_df.loc[activity_df['sport_type'].isin(
-        activity_types)]['description']
+    # Get a Series of descriptions for the applicable activity types. A column of all null
+    # descriptions is read as float64, so store them as objects for the string accessor.
+    activity_desc = activity_df.loc[activity_mask & activity_df['description'].notna(),
+                                    'description'].astype(object)
 
-    # Parse the tag from the activity descriptions and store it as a new column in the DataFrame
-    activity_df[column_name] = activity_desc.apply(
-        lambda desc: desc.partition(tag_str)[2].splitlines()[0] if tag_str in desc else None)
+    # Parse the rest of the line following the tag from the activity descriptions and store it as
+    # a new column in the DataFrame
+    activity_df[column_name] = activity_desc.str.extract(
+        f'{re.escape(tag_str)}([^\\r\\n]*)', expand=False)
 
     return activity_df
 
 
-def _get_activity_start_addr(activity) -> pd.DataFrame:
+def _parse_activity_dates(activity_df: pd.DataFrame) -> pd.DataFrame:
     """
-    Get the activity start address.
+    Parse the ISO 8601 timestamp columns in the given DataFrame into timezone-aware datetimes.
 
     Arguments:
-    activity - The activity to get the start address for.
+    activity_df - A pandas DataFrame containing the activity data.
+
+    Return:
+    The activity_df with the timestamp columns converted to datetimes.
     """
 
-    if activity['start_address'] is None and activity['start_latlng'] is not None:
-        print(f"Getting start address for {activity['name']}")
-        address = geo.get_address(activity['start_latlng'])
-    else:
-        address = activity['start_address']
+    for column in DATE_COLUMNS:
+        if column in activity_df.columns:
+            activity_df[column] = pd.to_datetime(activity_df[column], format='ISO8601', utc=True)
 
-    return address
+    return activity_df
 
 
-def _get_activity_end_addr(activity) -> pd.DataFrame:
+def get_date_range_mask(activity_df: pd.DataFrame, date_range_start: datetime | None,
+                        date_range_end: datetime | None) -> pd.Series:
     """
-    Get the activity end address.
+    Get a boolean mask of the activities that started within the given date range.
 
     Arguments:
-    activity - The activity to get the end address for.
+    activity_df - A pandas DataFrame containing the activity data.
+    date_range_start - The start of the date range, or None for no start bound.
+    date_range_end - The end of the date range, or None for no end bound.
+
+    Return:
+    A boolean pandas Series that is True for each activity within the date range.
     """
 
-    if activity['end_address'] is None and activity['end_latlng'] is not None:
-        print(f"Getting end address for {activity['name']}")
-        address = geo.get_address(activity['end_latlng'])
+    if 'start_date_local' not in activity_df.columns:
+        # An empty DataFrame has no activities within the date range
+        return pd.Series(False, index=activity_df.index)
+
+    start_dates = activity_df['start_date_local']
+
+    # Start the mask from the first bound given. Missing start dates never compare as within a
+    # bound, so they only need to be excluded explicitly when there are no bounds.
+    if date_range_start is not None:
+        date_mask = start_dates >= date_range_start
+
+        if date_range_end is not None:
+            date_mask &= start_dates <= date_range_end
+    elif date_range_end is not None:
+        date_mask = start_dates <= date_range_end
     else:
-        address = activity['end_address']
+        date_mask = start_dates.notna()
+
+    return date_mask
+
+
+def _update_activity_addresses(activity_df: pd.DataFrame, location: str,
+                               date_mask: pd.Series) -> bool:
+    """
+    Get the start or end addresses of the activities within the date range that do not already
+    have one.
+
+    Arguments:
+    activity_df - A pandas DataFrame containing the activity data.
+    location - The location to get the addresses for, either 'start' or 'end'.
+    date_mask - A boolean mask of the activities within the date range.
+
+    Return:
+    True if any addresses were updated, otherwise False.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import stravalyse.geo as geo
 
-    return address
+    address_column = f'{location}_address'
+    latlng_column = f'{location}_latlng'
+
+    if address_column not in activity_df.columns:
+        activity_df[address_column] = None
+
+    # Store the addresses as objects, since a column of all null addresses is read as float64
+    activity_df[address_column] = activity_df[address_column].astype(object)
+
+    # Only reverse geocode the activities that have coordinates but no address
+    update_mask = (date_mask & activity_df[address_column].isna() &
+                   activity_df[latlng_column].notna())
+
+    if update_mask.any():
+        addresses = []
+        for name, latlng in zip(activity_df.loc[update_mask, 'name'],
+                                activity_df.loc[update_mask, latlng_column]):
+            print(f"Getting {location} address for {name}")
+            addresses.append(geo.get_address(latlng))
+
+        activity_df.loc[update_mask, address_column] = pd.Series(
+            addresses, index=activity_df.index[update_mask], dtype=object)
+
+    return bool(update_mask.any())
+
+
+def _read_activity_data_from_cache(cache_file_path: Path) -> pd.DataFrame | None:
+    """
+    Read the activity data from a binary cache file and return it as a pandas DataFrame.
+
+    Arguments:
+    cache_file_path - The path of the cache file to read the activity data from.
+
+    Return:
+    A pandas DataFrame containing the activity data.
+    None if the cache file cannot be read from successfully.
+    """
+
+    activity_df = None
+
+    try:
+        activity_df = pd.read_pickle(cache_file_path)
+
+        print(f"Read {len(activity_df)} activities from '{cache_file_path}'")
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError,
+            TypeError):
+        print(f"Could not read activity data from '{cache_file_path}'")
+
+    return activity_df
 
 
 def _read_activity_data_from_file(file_path: Path) -> pd.DataFrame:
     """
     Read the activity data from a file and return it as a pandas DataFrame.
 
+    The binary cache file alongside the data file is read instead if it is at least as recent.
+
     Arguments:
     file_path - The path of the file to read the activity data from.
 
@@ -89,11 +201,18 @@ def _read_activity_data_from_file(file_path: Path) -> pd.DataFrame:
     An empty DataFrame if the file cannot be read from successfully.
     """
 
+    # Read the activity data from the cache if it is up to date with the data file
+    cache_file_path = file_path.with_suffix(CACHE_FILE_SUFFIX)
+    if cache_file_path.is_file() and cache_file_path.stat().st_mtime >= file_path.stat().st_mtime:
+        activity_df = _read_activity_data_from_cache(cache_file_path)
+        if activity_df is not None:
+            return activity_df
+
     activity_df = pd.DataFrame()
 
     try:
-        activity_df = pd.read_json(file_path, lines=True, orient='records',
-                                   convert_dates=['start_date', 'start_date_local'])
+        activity_df = pd.read_json(file_path, lines=True, orient='records', convert_dates=False)
+        activity_df = _parse_activity_dates(activity_df)
 
         print(f"Read {len(activity_df)} activities from '{file_path}'")
     except (ValueError, TypeError, AssertionError):
@@ -104,7 +223,7 @@ def _read_activity_data_from_file(file_path: Path) -> pd.DataFrame:
 
 def _write_activity_data_to_file(file_path: Path, activity_df: pd.DataFrame) -> None:
     """
-    Write the activity data to a file in JSON format.
+    Write the activity data to a file in JSON format, and to a binary cache file alongside it.
 
     Arguments:
     file_path - The path of the file to write the activity data to.
@@ -113,14 +232,45 @@ def _write_activity_data_to_file(file_path: Path, activity_df: pd.DataFrame) ->
 
     print(f"Writing activity data to '{file_path}'")
 
-    # Create the output directory if it doesn't already exist
-    file_dir = Path(Path.cwd() / file_path).parent
-    file_dir.mkdir(parents=True, exist_ok=True)
-
     # Write the activity DataFrame to the file
     activity_df.to_json(file_path, lines=True,
                         orient='records', date_format='iso')
 
+    # Write the activity DataFrame to the cache file after the data file so that the cache is
+    # never older than the data it was written with
+    activity_df.to_pickle(file_path.with_suffix(CACHE_FILE_SUFFIX))
+
+
+def _append_activity_data_to_file(file_path: Path, new_activities_df: pd.DataFrame,
+                                  activity_df: pd.DataFrame) -> None:
+    """
+    Append new activities to the activity data file in JSON format, and write the full activity
+    data to the binary cache file alongside it.
+
+    Arguments:
+    file_path - The path of the file to append the new activities to.
+    new_activities_df - A pandas DataFrame containing the new activities.
+    activity_df - A pandas DataFrame containing all of the activity data, including the new
+                  activities.
+    """
+
+    print(f"Appending {len(new_activities_df)} activities to '{file_path}'")
+
+    records = new_activities_df.to_json(lines=True, orient='records', date_format='iso')
+
+    with file_path.open(mode='a+b') as file:
+        # Start the new records on a new line if the file doesn't already end with one
+        if file.tell() > 0:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b'\n':
+                records = '\n' + records
+
+        file.write(records.encode('utf-8'))
+
+    # Write the full activity DataFrame to the cache file after the data file so that the cache is
+    # never older than the data it was written with
+    activity_df.to_pickle(file_path.with_suffix(CACHE_FILE_SUFFIX))
+
 
 def _get_last_activity_start_time(activity_df: pd.DataFrame) -> datetime:
     """
@@ -134,71 +284,142 @@ def _get_last_activity_start_time(activity_df: pd.DataFrame) -> datetime:
     """
 
     if activity_df.empty:
-        last_activity_time = "1970-01-01"
+        last_activity_time = datetime.fromtimestamp(0, timezone.utc)
     else:
-        # Get the start time of the last activity in the DataFrame
-        last_activity_time = activity_df.iloc[-1]['start_date']
+        # Get the start time of the last activity in the DataFrame. The activities are stored in
+        # order of start time, so this doesn't need to search the whole column.
+        last_activity_time = activity_df['start_date'].iat[-1]
 
     return last_activity_time
 
 
-def _update_activity_data(client: Client, file_path: Path, reverse_geocoding: bool,
-                          activity_df: pd.DataFrame) -> pd.DataFrame:
+def _get_detailed_activity_data(client: Client, activity) -> dict:
+    """
+    Get the detailed data for an activity.
+
+    Arguments:
+    client - The stravalib client.
+    activity - The summary activity to get the detailed data for.
+
+    Return:
+    A dictionary containing the detailed activity data.
+    """
+
+    print(f"Getting detailed activity data for '{activity.name}'")
+
+    return client.get_activity(activity.id).model_dump()
+
+
+def _get_new_activities(client: Client, activity_df: pd.DataFrame,
+                        date_range_end: datetime | None = None) -> Iterable:
+    """
+    Get the summary data of the activities started since the last stored activity.
+
+    Arguments:
+    client - The stravalib client.
+    activity_df - A pandas DataFrame containing the existing activity data.
+    date_range_end - Only get activities started before this date.
+
+    Return:
+    An iterable of summary activities in order of start time.
+    """
+
+    # Get the start time of the last stored activity
+    start_time = _get_last_activity_start_time(activity_df)
+
+    # Strava returns the activities in order of start time when only the 'after' bound is given,
+    # which keeps the stored activities in order and lets an interrupted fetch resume from the
+    # last stored activity. Stop at the first activity after the end of the date range instead
+    # of passing a 'before' bound, which reverses the order.
+    activities = client.get_activities(after=start_time)
+    if date_range_end is not None:
+        fetch_end = date_range_end + DATE_RANGE_FETCH_MARGIN
+        activities = takewhile(lambda activity: activity.start_date <= fetch_end, activities)
+
+    return activities
+
+
+def _update_activity_data(client: Client, file_path: Path, config_data: dict,
+                          activity_df: pd.DataFrame,
+                          date_range_end: datetime | None = None) -> pd.DataFrame:
     """
     Update the data file and activity DataFrame with any new activities uploaded to Strava since
     the last stored activity.
 
     Arguments:
-    access_token - An OAuth2 access token for the Strava v3 API.
-    reverse_geocoding - Get and store the activity start and end addresses.
+    client - The stravalib client.
+    file_path - The path of the file to store the activity data to.
+    config_data - The configuration data. 'reverse_geocoding' gets and stores the activity start
+                  and end addresses, and 'detailed_activity_data' gets the detailed data for
+                  each activity rather than only the summary data returned by the activity list.
     activity_df - A pandas DataFrame containing the existing activity data.
+    date_range_end - Only get activities started before this date. Activities started after it
+                     are fetched on a later run.
     """
 
     print('Checking for new activities')
 
-    # Get the start time of the last stored activity
-    start_time = _get_last_activity_start_time(activity_df)
+    reverse_geocoding = config_data['reverse_geocoding']
+    if reverse_geocoding:
+        # Only load the geospatial dependencies when they are needed
+        # pylint: disable=import-outside-toplevel
+        import stravalyse.geo as geo
 
     new_activities = []
+    executor = None
     try:
-        activities = client.get_activities(after=start_time)
-
-        for activity in activities:
-            print(f"Getting detailed activity data for '{
-                activity.name}'")
-
-            # Get detailed activity data for each activity in the page and store it as a dictionary
-            detailed_data = client.get_activity(activity.id).model_dump()
+        activities = _get_new_activities(client, activity_df, date_range_end)
+
+        if config_data.get('detailed_activity_data', True):
+            # Get detailed activity data for each activity using a pool of worker threads. The
+            # results are returned in the original activity order.
+            print('Getting detailed activity data')
+            executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS)
+            activities_data = executor.map(lambda activity: _get_detailed_activity_data(
+                client, activity), activities)
+        else:
+            # Use the summary activity data from the activity list, which needs no further requests
+            print('Getting summary activity data')
+            activities_data = (activity.model_dump() for activity in activities)
 
+        for activity_data in activities_data:
             if reverse_geocoding:
                 # Get the activity start and end addresses. This is done using a reverse geocoder
                 # with low API rate limits, so fetch the addresses per-activity before conversion
-                # into a DataFrame in the otherwise wasted time spent waiting between the Strava API
-                # 15-minute rate limits. This reduces the combined fetch time for activities +
-                # addresses for larger datasets that are frequently rate-limited.
-                detailed_data['start_address'] = geo.get_address(
-                    detailed_data['start_latlng'])
-                detailed_data['end_address'] = geo.get_address(
-                    detailed_data['end_latlng'])
+                # into a DataFrame while the worker threads fetch the next activities and wait out
+                # the Strava API 15-minute rate limits. This reduces the combined fetch time for
+                # activities + addresses for larger datasets that are frequently rate-limited.
+                activity_data['start_address'] = geo.get_address(
+                    activity_data['start_latlng'])
+                activity_data['end_address'] = geo.get_address(
+                    activity_data['end_latlng'])
 
-            new_activities.append(detailed_data)
+            new_activities.append(activity_data)
 
     finally:
+        if executor is not None:
+            # Cancel any fetches that have not started yet, e.g. after a rate limit error. Don't
+            # wait for the fetches in progress, which may be sleeping in the rate limiter, so that
+            # the activities fetched so far are written straight away.
+            executor.shutdown(wait=False, cancel_futures=True)
+
         if new_activities:
             # Create a DataFrame with the new activities and parse the activity start dates into
             # datetime objects
-            new_activities_df = pd.DataFrame(new_activities)
-            new_activities_df['start_date'] = pd.to_datetime(new_activities_df['start_date'],
-                                                             utc=True)
-            new_activities_df['start_date_local'] = pd.to_datetime(
-                new_activities_df['start_date_local'], utc=True)
-
-            # Append the new activities to the existing DataFrame
-            activity_df_updated = pd.concat(
-                [activity_df, new_activities_df], ignore_index=True)
-
-            # Write the updated activity data to the Strava activities file
-            _write_activity_data_to_file(file_path, activity_df_updated)
+            new_activities_df = _parse_activity_dates(pd.DataFrame.from_records(new_activities))
+
+            if activity_df.empty:
+                activity_df_updated = new_activities_df
+
+                # Write the activity data to a new Strava activities file
+                _write_activity_data_to_file(file_path, activity_df_updated)
+            else:
+                # Append the new activities to the existing DataFrame
+                activity_df_updated = pd.concat(
+                    [activity_df, new_activities_df], ignore_index=True)
+
+                # Append only the new activities to the existing Strava activities file
+                _append_activity_data_to_file(file_path, new_activities_df, activity_df_updated)
         else:
             activity_df_updated = activity_df
 
@@ -206,50 +427,70 @@ def _update_activity_data(client: Client, file_path: Path, reverse_geocoding: bo
 
 
 def get_activity_data(client: Client, data_file_path: Path, config_data: dict,
-                      refresh: bool = False) -> pd.DataFrame:
+                      refresh: bool = False,
+                      date_range: DateRange = (None, None)) -> pd.DataFrame:
     """
     Get and store a pandas DataFrame of detailed data for all Strava activities.
 
+    Activities started after the end of the date range are not fetched, and the addresses of
+    existing activities outside the date range are not updated. The returned DataFrame may still
+    contain activities outside the date range.
+
     Arguments:
     client - The stravalib client.
     data_file_path - The path of the file to store the activity data to.
     config_data - The configuration data.
     refresh - Delete the existing activity data and get a fresh copy.
+    date_range - The start and end of the date range of interest. Either may be None for no
+                 bound.
 
     Return:
     A pandas DataFrame containing detailed activity data.
     """
 
+    date_range_start, date_range_end = date_range
     activity_df = pd.DataFrame()
 
+    # Create the output directory if it doesn't already exist
+    data_file_path.parent.mkdir(parents=True, exist_ok=True)
+
     if refresh:
         print('Refreshing activity data')
 
-        # Force the activity data to be refreshed by deleting the file
-        try:
-            data_file_path.unlink()
-        except OSError:
-            pass
+        # Force the activity data to be refreshed by deleting the file and its cache
+        data_file_path.unlink(missing_ok=True)
+        data_file_path.with_suffix(CACHE_FILE_SUFFIX).unlink(missing_ok=True)
     else:
         if data_file_path.is_file():
             activity_df = _read_activity_data_from_file(data_file_path)
 
             # Get start and end addresses for the existing activities
-            if config_data['reverse_geocoding'] and config_data['update_existing_activities']:
+            if (config_data['reverse_geocoding'] and config_data['update_existing_activities'] and
+                    not activity_df.empty):
                 print('Getting start and end addresses for existing activities')
-                activity_df['start_address'] = activity_df.apply(
-                    _get_activity_start_addr, axis='columns')
-                activity_df['end_address'] = activity_df.apply(
-                    _get_activity_end_addr, axis='columns')
+                date_mask = get_date_range_mask(activity_df, date_range_start, date_range_end)
+
+                start_updated = _update_activity_addresses(activity_df, 'start', date_mask)
+                end_updated = _update_activity_addresses(activity_df, 'end', date_mask)
 
-                _write_activity_data_to_file(data_file_path, activity_df)
+                # Only rewrite the file if any addresses were actually updated
+                if start_updated or end_updated:
+                    _write_activity_data_to_file(data_file_path, activity_df)
 
-    activity_df = _update_activity_data(
-        client, data_file_path, config_data['reverse_geocoding'], activity_df)
+    activity_df = _update_activity_data(client, data_file_path, config_data, activity_df,
+                                        date_range_end)
 
-    if config_data['description_tags']:
+    if config_data['description_tags'] and not config_data.get('detailed_activity_data', True):
+        print('Activity descriptions are only available with detailed activity data')
+    elif config_data['description_tags'] and 'description' in activity_df.columns:
+        # Tags often share the same activity types, so only build each activity type mask once
+        activity_masks = {}
         for tag in config_data['description_tags']:
+            activity_types = frozenset(tag['activity_types'])
+            if activity_types not in activity_masks:
+                activity_masks[activity_types] = activity_df['sport_type'].isin(activity_types)
+
             _parse_description_tag(
-                activity_df, tag['tag_name'], tag['column_name'], tag['activity_types'])
+                activity_df, tag['tag_name'], tag['column_name'], activity_masks[activity_types])
 
     return activity_df
@@ -10,25 +10,22 @@ import argparse
 import datetime
 from pathlib import Path
 import sys
+import tomllib
+from typing import TYPE_CHECKING
 
-# Third-party
-import pandas as pd
-from stravalib import Client
-from toml import load
-
-# Local
-import stravalyse.analysis as analysis
-import stravalyse.geo as geo
-import stravalyse.strava_auth as strava_auth
-import stravalyse.strava_data as strava_data
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Configuration file path
 CONFIG_FILE_PATH = 'config.toml'
 
 
-def main():
+def _build_parser() -> argparse.ArgumentParser:
     """
-    Main method for Stravalyse.
+    Build the command line argument parser.
+
+    Return:
+    An ArgumentParser for the Stravalyse command line options.
     """
 
     parser = argparse.ArgumentParser(description=__doc__)
@@ -66,6 +63,11 @@ def main():
                         action='store_true',
                         required=False,
                         help='Get and store a fresh copy of the activity data')
+    parser.add_argument('--no_browser',
+                        action='store_true',
+                        required=False,
+                        help=('Print the Strava authorization URL instead of opening it in a'
+                              ' browser'))
     parser.add_argument('--date_range_start',
                         action='store',
                         default=None,
@@ -78,92 +80,130 @@ def main():
                         required=False,
                         type=datetime.datetime.fromisoformat,
                         help='Specify the end of a date range in ISO format')
-    args = parser.parse_args()
 
-    # Load the TOML configuration
-    config = load(CONFIG_FILE_PATH)
+    return parser
 
-    # Configure pandas to display float values to 2 decimal places
-    pd.options.display.float_format = "{:,.2f}".format
 
-    # Authenticate with the Strava API
-    client: Client = strava_auth.authenticate(Path(
-        config['paths']['strava_tokens_file']))
+def _export_geo_data(activity_df: 'pd.DataFrame', file_path: Path):
+    """
+    Export the geospatial data from all activities in GeoJSON format.
 
-    # Create a pandas DataFrame of detailed Strava activity data
-    activity_df: pd.DataFrame = strava_data.get_activity_data(client,
-                                                              Path(
-                                                                  config['paths']['activity_data_file']),
-                                                              config['data'],
-                                                              args.refresh_data)
+    Arguments:
+    activity_df - A pandas DataFrame containing the activity data.
+    file_path - The path of the file to export the geospatial activity data to.
+    """
 
-    if args.date_range_start is not None or args.date_range_end is not None:
-        date_mask = [True] * len(activity_df)
+    # pylint: disable=import-outside-toplevel
+    import stravalyse.geo as geo
+
+    geo.export_geo_data_file(file_path, activity_df)
+
+
+def _print_reverse_geocoding_required():
+    """
+    Print a message explaining that reverse geocoding must be enabled to plot start locations.
+    """
 
-        if args.date_range_start is not None:
-            # Add timezone information to the start date
-            args.date_range_start = args.date_range_start.replace(
-                tzinfo=datetime.timezone.utc)
+    print("Reverse geocoding must be enabled to generate this plot.",
+          f"Set 'reverse_geocoding' in {CONFIG_FILE_PATH} to 'true',",
+          "then refresh the activity data using the argument '-r'.")
 
-            # Add the start date to the date mask
-            date_mask = (date_mask &
-                         (activity_df['start_date_local'] >= args.date_range_start))
 
-        if args.date_range_end is not None:
-            # Add timezone information to the end date
-            args.date_range_end = args.date_range_end.replace(
-                tzinfo=datetime.timezone.utc)
+def _run(args: argparse.Namespace):
+    """
+    Run Stravalyse with the given command line arguments.
+
+    Arguments:
+    args - The parsed command line arguments.
+    """
 
-            if args.date_range_start is not None and args.date_range_end < args.date_range_start:
-                sys.exit('[ERROR]: End date must be later than start date')
-            else:
-                # Add the end date to the date mask
-                date_mask = (date_mask &
-                             (activity_df['start_date_local'] <= args.date_range_end))
+    # Import the data and analysis modules here so that their heavy dependencies (pandas,
+    # matplotlib, geopandas) are only loaded once the arguments have been parsed
+    # pylint: disable=import-outside-toplevel
+    from stravalib import Client
 
-        # Apply the date mask to the activity DataFrame
-        activity_df = activity_df[date_mask]
+    import stravalyse.analysis as analysis
+    import stravalyse.strava_auth as strava_auth
+    import stravalyse.strava_data as strava_data
+
+    # Load the TOML configuration
+    with open(CONFIG_FILE_PATH, mode='rb') as file:
+        config = tomllib.load(file)
+
+    paths = {name: Path(path) for name, path in config['paths'].items()}
+
+    if args.date_range_start is not None:
+        # Add timezone information to the start date
+        args.date_range_start = args.date_range_start.replace(
+            tzinfo=datetime.timezone.utc)
+
+    if args.date_range_end is not None:
+        # Add timezone information to the end date
+        args.date_range_end = args.date_range_end.replace(
+            tzinfo=datetime.timezone.utc)
+
+        if args.date_range_start is not None and args.date_range_end < args.date_range_start:
+            sys.exit('[ERROR]: End date must be later than start date')
+
+    # Authenticate with the Strava API
+    client: Client = strava_auth.authenticate(paths['strava_tokens_file'], not args.no_browser)
+
+    # Create a pandas DataFrame of detailed Strava activity data
+    activity_df: 'pd.DataFrame' = strava_data.get_activity_data(client,
+                                                                paths['activity_data_file'],
+                                                                config['data'],
+                                                                args.refresh_data,
+                                                                (args.date_range_start,
+                                                                 args.date_range_end))
+
+    if args.date_range_start is not None or args.date_range_end is not None:
+        # Only keep the activities within the date range
+        activity_df = activity_df[strava_data.get_date_range_mask(activity_df,
+                                                                  args.date_range_start,
+                                                                  args.date_range_end)]
 
     # Display summary and commute statistics
     analysis.display_summary_statistics(activity_df)
     analysis.display_commute_statistics(activity_df)
 
-    if args.export_geo_data or args.export_upload_geo_data:
-        # Export the geospatial data from all activities in GeoJSON format
-        geo.export_geo_data_file(
-            config['paths']['geo_data_file'], activity_df)
-
-    if args.activity_count_plot:
-        # Generate and display a plot of activity counts over time
-        analysis.display_activity_count_plot(activity_df,
-                                             config['analysis']['plot_colour_palette'])
-
-    if args.commute_plots:
-        # Generate and display plots of the commute data
-        analysis.display_commute_plots(activity_df,
-                                       config['analysis']['plot_colour_palette'])
-
-    if args.mean_distance_plot:
-        # Generate and display a plot of the mean activity distance over time
-        analysis.display_mean_distance_plot(activity_df,
-                                            config['analysis']['plot_colour_palette'])
-
-    if args.start_locations_plot:
-        if config['data']['enable_reverse_geocoding']:
-            # Generate and display a plot of the number of activities started in each country
-            analysis.display_start_country_plot(activity_df,
-                                                config['analysis']['plot_colour_palette'])
-        else:
-            print("Reverse geocoding must be enabled to generate this plot.",
-                  f"Set 'enable_reverse_geocoding' in {
-                      CONFIG_FILE_PATH} to 'true',",
-                  "then refresh the activity data using the argument '-r'.")
-
-    if args.moving_time_heatmap:
-        # Generate and display a heatmap of moving time for each activity type
-        analysis.display_moving_time_heatmap(activity_df,
-                                             config['analysis']['heatmap_colour_palette'],
-                                             config['analysis']['heatmap_column_wrap'])
+    palette = config['analysis']['plot_colour_palette']
+
+    # Actions to run for each set of command line flags, in the order they are run
+    actions = {
+        ('export_geo_data', 'export_upload_geo_data'):
+            lambda: _export_geo_data(activity_df, paths['geo_data_file']),
+        ('activity_count_plot',):
+            lambda: analysis.display_activity_count_plot(activity_df, palette, show=False),
+        ('commute_plots',):
+            lambda: analysis.display_commute_plots(activity_df, palette, show=False),
+        ('mean_distance_plot',):
+            lambda: analysis.display_mean_distance_plot(activity_df, palette, show=False),
+        ('start_locations_plot',):
+            (lambda: analysis.display_start_country_plot(activity_df, palette, show=False))
+            if config['data']['reverse_geocoding'] else _print_reverse_geocoding_required,
+        ('moving_time_heatmap',):
+            lambda: analysis.display_moving_time_heatmap(
+                activity_df, config['analysis']['heatmap_colour_palette'],
+                config['analysis']['heatmap_column_wrap'], show=False)}
+
+    # Run the actions selected by the command line arguments
+    for flags, action in actions.items():
+        if any(getattr(args, flag) for flag in flags):
+            action()
+
+    # Display all of the generated plots together rather than one at a time
+    analysis.show_plots()
+
+
+def main():
+    """
+    Main method for Stravalyse.
+    """
+
+    # Parse the arguments before running so that '--help' returns without importing any of the
+    # heavy third-party dependencies
+    args = _build_parser().parse_args()
+    _run(args)
 
 
 if __name__ == "__main__":